@@ -10,6 +10,24 @@ __all__ = [
     "ElmerComponent",
     "StepwiseResistor",
     "Circuit",
+    "Netlist",
+    "CircuitPlan",
+    "plan_circuits",
+    "register_stamp",
+    "solve_frequency_sweep",
+    "solve_transient",
+    "Sine",
+    "PWL",
+    "solve_parameter_sweep",
+    "tolerance_samples",
+    "solve_circuit",
+    "CircuitSolution",
+    "kron_reduce",
+    "solve_sensitivities",
+    "find_islands",
+    "CircuitFileWriter",
+    "render_elmer_circuits",
+    "iter_elmer_circuits",
     "number_of_circuits",
     "generate_elmer_circuits",
     "say_hello",
@@ -46,6 +64,24 @@ try:
         ElmerComponent,
         StepwiseResistor,
         Circuit,
+        Netlist,
+        CircuitPlan,
+        plan_circuits,
+        register_stamp,
+        solve_frequency_sweep,
+        solve_transient,
+        Sine,
+        PWL,
+        solve_parameter_sweep,
+        tolerance_samples,
+        solve_circuit,
+        CircuitSolution,
+        kron_reduce,
+        solve_sensitivities,
+        find_islands,
+        CircuitFileWriter,
+        render_elmer_circuits,
+        iter_elmer_circuits,
         number_of_circuits,
         generate_elmer_circuits,
         say_hello,
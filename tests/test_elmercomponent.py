@@ -69,3 +69,154 @@ def test_generate_elmer_circuits_writes_elmer_component(tmp_path: Path):
     assert "Coil Type" in text or "Component  Type" in text
     # parameters section should include Ns_<name>
     assert f"Ns_{ec.name}" in text or "Parameters" in text
+
+
+def test_index_netlist_builds_names_and_vcomp_rows_in_one_pass():
+    from elmer_circuitbuilder import V
+    from elmer_circuitbuilder.core import index_netlist
+
+    components = [
+        V("V1", 1, 2, 1.0),
+        ElmerComponent("EC1", 2, 3, component_number=4, master_body_list=[1]),
+        ElmerComponent("EC2", 3, 1, component_number=9, master_body_list=[2]),
+    ]
+    nodes, unknown_names, v_comp_rows = index_netlist(components, 1, 2)
+    assert nodes.unknown_labels == [2, 3]
+    assert unknown_names == [
+        '"i_V1"',
+        '"i_component(4)"',
+        '"i_component(9)"',
+        '"v_V1"',
+        '"v_component(4)"',
+        '"v_component(9)"',
+        '"u_2_circuit_2"',
+        '"u_3_circuit_2"',
+    ]
+    assert v_comp_rows == [4, 5]
+    assert create_unknown_name(components, 1, 2) == (unknown_names, v_comp_rows)
+
+
+def test_index_netlist_handles_large_netlists():
+    from elmer_circuitbuilder.core import get_num_nodes, index_netlist
+
+    components = [
+        ElmerComponent(f"EC{k}", k, k + 1, component_number=k, master_body_list=[k])
+        for k in range(1, 50001)
+    ]
+    nodes, unknown_names, v_comp_rows = index_netlist(components, 1, 1)
+    assert nodes.num_nodes == get_num_nodes(components) == 50001
+    assert len(unknown_names) == 2 * 50000 + 50000
+    assert v_comp_rows == list(range(50000, 100000))
+
+
+def _multi_phase_circuits():
+    from elmer_circuitbuilder import R, V, L, number_of_circuits
+
+    circuits = number_of_circuits(4)
+    for phase in range(1, 4):
+        coil = ElmerComponent(
+            f"Coil{phase}", 3, 1, component_number=phase, master_body_list=[phase]
+        )
+        coil.stranded(10 * phase, 0.5)
+        circuits[phase].components.append(
+            [
+                V(f"V{phase}", 1, 2, complex(1.0, phase)),
+                R(f"R{phase}", 2, 3, 1.5),
+                L(f"L{phase}", 3, 1, 1e-3),
+                coil,
+            ]
+        )
+    circuits[4].components.append([V("V4", 1, 2, 1.0), R("R4", 2, 1, 2.0)])
+    return circuits
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+def test_parallel_generation_is_identical_to_serial(tmp_path, capsys, formulation):
+    serial, parallel = tmp_path / "serial.definition", tmp_path / "parallel.definition"
+    generate_elmer_circuits(_multi_phase_circuits(), str(serial), formulation)
+    serial_log = capsys.readouterr().out.replace(str(serial), "OFILE")
+    generate_elmer_circuits(
+        _multi_phase_circuits(),
+        str(parallel),
+        formulation,
+        parallel=True,
+        max_workers=2,
+    )
+    parallel_log = capsys.readouterr().out.replace(str(parallel), "OFILE")
+
+    assert parallel.read_bytes() == serial.read_bytes()
+    assert parallel_log == serial_log
+
+
+def test_validation_solves_each_standalone_circuit_once(tmp_path, capsys):
+    from elmer_circuitbuilder import R, V
+    from elmer_circuitbuilder.core import plan_circuits
+
+    circuits = _multi_phase_circuits()
+    circuits[5] = Circuit(5, [[V("V5", 1, 2, 2.0), R("R5", 2, 1, 4.0)]])
+    circuits[6] = Circuit(6, [[V("V6", 1, 2, None), R("R6", 2, 1, 4.0)]])
+    plans = plan_circuits(circuits)
+    assert [plan.number for plan in plans] == [1, 2, 3, 4, 5, 6]
+    assert [plan.has_elmer_components for plan in plans] == [True] * 3 + [False] * 3
+    assert [plan.has_undefined_values for plan in plans[3:]] == [False, False, True]
+
+    out = tmp_path / "circuit.definition"
+    generate_elmer_circuits(circuits, str(out))
+    assert "Solution:" not in capsys.readouterr().out
+
+    generate_elmer_circuits(circuits, str(out), validate=True)
+    log = capsys.readouterr().out
+    assert log.count("Solution:") == 2
+    assert log.count('"u_2_circuit_4"') == log.count('"u_2_circuit_5"') == 1
+    assert "Circuit 6 has undefined component values" in log
+
+
+def test_definition_is_written_through_a_single_buffered_handle(tmp_path):
+    from elmer_circuitbuilder.core import CircuitFileWriter
+
+    class CountingStream:
+        def __init__(self):
+            self.chunks = []
+
+        def write(self, text):
+            self.chunks.append(text)
+            return len(text)
+
+    stream = CountingStream()
+    generate_elmer_circuits(_multi_phase_circuits(), stream)
+    out = tmp_path / "circuit.definition"
+    generate_elmer_circuits(_multi_phase_circuits(), str(out))
+    assert "".join(stream.chunks) == out.read_text()
+    assert len(stream.chunks) == 1
+
+    stream = CountingStream()
+    with CircuitFileWriter(stream, buffer_size=1000) as writer:
+        for _ in range(100):
+            print("x" * 99, file=writer)
+    assert "".join(stream.chunks) == ("x" * 99 + "\n") * 100
+    assert len(stream.chunks) == 10
+
+
+def test_in_memory_rendering_matches_file_output(tmp_path):
+    import io
+
+    from elmer_circuitbuilder import iter_elmer_circuits, render_elmer_circuits
+
+    out = tmp_path / "circuit.definition"
+    generate_elmer_circuits(_multi_phase_circuits(), str(out))
+    expected = out.read_text()
+
+    assert render_elmer_circuits(_multi_phase_circuits()) == expected
+    assert render_elmer_circuits(_multi_phase_circuits(), "utf-8") == out.read_bytes()
+
+    chunks = list(iter_elmer_circuits(_multi_phase_circuits(), chunk_size=500))
+    assert len(chunks) > 3
+    assert all(len(chunk) >= 500 for chunk in chunks[:-1])
+    assert "".join(chunks) == expected
+
+    stream = io.StringIO()
+    generate_elmer_circuits(_multi_phase_circuits(), stream)
+    assert stream.getvalue() == expected
+
+    standalone = {4: _multi_phase_circuits()[4]}
+    assert render_elmer_circuits(standalone) == ""
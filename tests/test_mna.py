@@ -0,0 +1,254 @@
+import re
+
+import numpy as np
+import pytest
+
+from elmer_circuitbuilder import (
+    R,
+    V,
+    I,
+    L,
+    C,
+    ElmerComponent,
+    number_of_circuits,
+    generate_elmer_circuits,
+)
+from elmer_circuitbuilder.core import (
+    Netlist,
+    kron_reduce,
+    assemble_mna,
+    assemble_tableau,
+    index_netlist,
+    solve_system,
+)
+
+
+def lumped_components():
+    return [
+        V("V1", 1, 2, 10.0),
+        R("R1", 2, 3, 5.0),
+        L("L1", 3, 1, 1e-2),
+        C("C1", 2, 1, 1e-4),
+        I("I1", 3, 1, complex(0.5, 0.1)),
+        R("R2", 3, 4, 2.0),
+        C("C2", 4, 1, 1e-3),
+        R("Rloop", 4, 4, 1.0),
+    ]
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("ref_node", [1, 3])
+def test_mna_solution_matches_tableau_solution(sparse, ref_node):
+    if sparse:
+        pytest.importorskip("scipy")
+    components = lumped_components()
+    netlist = Netlist(components, ref_node)
+    _, tableau_names, _ = index_netlist(components, ref_node, 1)
+    _, mna_names, _ = index_netlist(components, ref_node, 1, formulation="mna")
+    x_tableau = solve_system(*assemble_tableau(netlist, sparse=sparse))
+    x_mna = solve_system(*assemble_mna(netlist, sparse=sparse))
+
+    assert len(mna_names) == x_mna.shape[0] < x_tableau.shape[0]
+    expected = dict(zip(tableau_names, x_tableau[:, 0]))
+    for name, value in zip(mna_names, x_mna[:, 0]):
+        assert value == pytest.approx(expected[name])
+
+
+def test_mna_unknowns_keep_elmer_component_names():
+    components = [
+        V("V1", 1, 2, 1.0),
+        R("R1", 2, 3, 2.0),
+        ElmerComponent("Coil1", 3, 1, 1, [1]),
+    ]
+    _, names, vcomp_rows = index_netlist(components, 1, 1, formulation="mna")
+    assert names == [
+        '"i_V1"',
+        '"i_component(1)"',
+        '"v_component(1)"',
+        '"u_2_circuit_1"',
+        '"u_3_circuit_1"',
+    ]
+    assert vcomp_rows == [2]
+    M1, M2, b = assemble_mna(Netlist(components), symbolic=True)
+    assert M1.shape == (5, 5)
+    assert b.items() == [(2, 0, "-V1")]
+
+
+def _matc_vector(literal):
+    # elements of a compact "[(a) (b) ...]" vector, split at the top-level parentheses
+    elements, depth = [], 0
+    for char in literal.strip()[1:-1]:
+        if char == "(" and depth == 0:
+            elements.append("")
+        elif depth:
+            elements[-1] += char
+        depth += {"(": 1, ")": -1}.get(char, 0)
+    return [element[:-1] for element in elements]
+
+
+def _expand_row_slices(text):
+    # expands the row slices of the compact mode into one line per entry
+    lines = []
+    for line in text.splitlines():
+        match = re.match(r"\$ (C\.1\.[AB])\((\d+),(\d+):(\d+)\) = (\[.*\])$", line)
+        if match is None:
+            lines.append(line)
+            continue
+        name, i, j0, j1 = match.group(1), *map(int, match.group(2, 3, 4))
+        values = _matc_vector(match.group(5))
+        assert len(values) == j1 - j0 + 1
+        lines += [f"$ {name}({i},{j0 + k}) = {v}" for k, v in enumerate(values)]
+    return "\n".join(lines)
+
+
+def _parse_circuit_file(path):
+    text = _expand_row_slices(open(path).read())
+    params = {
+        k: float(v) for k, v in re.findall(r"^\$ (\w+) = ([-\d.e]+)$", text, re.M)
+    }
+    n = int(re.search(r"\$ C\.1\.variables = (\d+)", text).group(1))
+    names = re.findall(r"\$ C\.1\.name\.\d+ = (.*)", text)
+    A, B, f = np.zeros((n, n)), np.zeros((n, n)), np.zeros(n)
+    for matrix, i, j, expr in re.findall(r"\$ C\.1\.([AB])\((\d+),(\d+)\) = (.*)", text):
+        value = eval(expr, {}, dict(params))
+        (A if matrix == "A" else B)[int(i), int(j)] = value
+    for k, source in re.findall(r'\$ C\.1\.source\.(\d+) = "(\w+)_Source"', text):
+        f[int(k) - 1] = params[source]
+    return names, A, B, f
+
+
+def _close_coil_equation(names, A, B, resistance):
+    # ElmerSolver fills the v_component row: close it with v = R_coil * i
+    v = names.index('"v_component(1)"')
+    assert not B[v].any() and not A[v].any()
+    B[v, v] = 1.0
+    B[v, names.index('"i_component(1)"')] = -resistance
+
+
+def test_mna_circuit_file_is_equivalent_to_tableau_circuit_file(tmp_path):
+    def circuit():
+        c = number_of_circuits(1)
+        c[1].components.append(
+            [
+                V("V1", 1, 2, 1.0),
+                R("R1", 2, 3, 2.0),
+                R("R2", 3, 1, 4.0),
+                C("C1", 3, 1, 1e-3),
+                I("I1", 1, 3, 0.5),
+                L("L1", 3, 4, 1e-3),
+                ElmerComponent("Coil1", 4, 1, 1, [1]),
+            ]
+        )
+        return c
+
+    solutions = {}
+    for formulation in ("tableau", "mna"):
+        ofile = tmp_path / (formulation + ".definition")
+        generate_elmer_circuits(circuit(), str(ofile), formulation=formulation)
+        names, A, B, f = _parse_circuit_file(ofile)
+        if formulation == "mna":
+            # conductances meeting at a node are summed with "+"
+            assert re.search(r"= 1/R[12]\+1/R[12]$", ofile.read_text(), re.M)
+        _close_coil_equation(names, A, B, resistance=3.0)
+        x = np.linalg.solve(B + 1j * 2 * np.pi * 50 * A, f)
+        solutions[formulation] = dict(zip(names, x))
+
+    tableau, mna = solutions["tableau"], solutions["mna"]
+    assert len(mna) < len(tableau)
+    for name, value in mna.items():
+        assert value == pytest.approx(tableau[name])
+
+
+def ladder_components(stages=10):
+    return (
+        [V("V1", 1, 2, 10.0)]
+        + [R(f"R{k}", k, k + 1, 0.5) for k in range(2, stages + 2)]
+        + [C(f"C{k}", k + 1, 1, 1e-4) for k in range(2, stages + 2)]
+        + [L(f"L{k}", k, 1, 5e-2) for k in range(3, stages + 2)]
+    )
+
+
+@pytest.mark.parametrize("freq", [50, 400])
+def test_kron_reduction_keeps_port_solution(freq):
+    components = ladder_components() + [I("I1", 12, 1, 0.3)]
+    reduced = kron_reduce(components, freq)
+
+    names = [c.name for c in reduced]
+    assert names[:3] == ["V1", "C11", "I1"]
+    assert all("kron_" in name for name in names[3:])
+    assert len(reduced) < len(components)
+
+    def solve(components):
+        netlist = Netlist(components)
+        _, unknown_names, _ = index_netlist(components, 1, 1)
+        x = solve_system(*assemble_tableau(netlist), freq=freq)[:, 0]
+        return dict(zip(unknown_names, x))
+
+    full, port = solve(components), solve(reduced)
+    for name in ('"i_V1"', '"v_I1"', '"u_2_circuit_1"', '"u_12_circuit_1"'):
+        assert port[name] == pytest.approx(full[name])
+
+
+def test_kron_reduction_keeps_explicit_ports_and_checks_values():
+    components = ladder_components(3)
+    assert [c.name for c in kron_reduce(components, 50, ports=[3, 4, 5])] == [
+        c.name for c in components
+    ]
+    with pytest.raises(ValueError):
+        kron_reduce(components, 0)
+    with pytest.raises(ValueError):
+        kron_reduce(components + [R("R0", 4, 6, 0.0)], 50)
+
+
+def test_kron_reduced_circuit_file_matches_full_circuit_file(tmp_path):
+    def circuit():
+        c = number_of_circuits(1)
+        coil = ElmerComponent("Coil1", 12, 1, 1, [1])
+        c[1].components.append(ladder_components() + [coil])
+        return c
+
+    solutions = {}
+    for kron_freq in (None, 50):
+        ofile = tmp_path / f"kron_{kron_freq}.definition"
+        generate_elmer_circuits(circuit(), str(ofile), kron_freq=kron_freq)
+        names, A, B, f = _parse_circuit_file(ofile)
+        _close_coil_equation(names, A, B, resistance=3.0)
+        x = np.linalg.solve(B + 1j * 2 * np.pi * 50 * A, f)
+        solutions[kron_freq] = dict(zip(names, x))
+
+    full, reduced = solutions[None], solutions[50]
+    assert len(reduced) < len(full) / 3
+    for name in ('"i_component(1)"', '"v_component(1)"', '"u_2_circuit_1"'):
+        assert reduced[name] == pytest.approx(full[name])
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+def test_compact_circuit_file_holds_the_same_matrices(tmp_path, formulation):
+    def circuit():
+        c = number_of_circuits(1)
+        coil = ElmerComponent("Coil1", 12, 1, 1, [1])
+        c[1].components.append(ladder_components() + [coil])
+        return c
+
+    files = {}
+    for compact in (False, True):
+        ofile = tmp_path / f"{formulation}_{compact}.definition"
+        generate_elmer_circuits(
+            circuit(), str(ofile), formulation=formulation, compact=compact
+        )
+        files[compact] = ofile
+
+    text = files[True].read_text()
+    assert re.search(r"^\$ C\.1\.B\(\d+,\d+:\d+\) = \[\(", text, re.M)
+    matrix_lines = r"^\$ C\.1\.[AB]\("
+    assert len(re.findall(matrix_lines, text, re.M)) < len(
+        re.findall(matrix_lines, files[False].read_text(), re.M)
+    )
+    assert len(text) < len(files[False].read_text())
+    # only C.1.A and C.1.B entries change, no other MATC name is assigned
+    assigned = set(re.findall(r"^\$ ([\w.]+)", text, re.M))
+    assert assigned == set(re.findall(r"^\$ ([\w.]+)", files[False].read_text(), re.M))
+    full, compact = _parse_circuit_file(files[False]), _parse_circuit_file(files[True])
+    assert full[0] == compact[0]
+    for expected, value in zip(full[1:], compact[1:]):
+        np.testing.assert_array_equal(value, expected)
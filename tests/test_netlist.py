@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from elmer_circuitbuilder import (
+    R,
+    V,
+    I,
+    L,
+    C,
+    ElmerComponent,
+    StepwiseResistor,
+    Netlist,
+    find_islands,
+)
+from elmer_circuitbuilder.core import get_indices
+
+
+def mixed_components():
+    return [
+        V("V1", 1, 2, complex(1, 1)),
+        R("R1", 2, 3, 2.0),
+        L("L1", 3, 4, 1e-3),
+        C("C1", 4, 1, 1e-6),
+        I("I1", 1, 3, 0.5),
+        ElmerComponent("Coil", 4, 1, 3, [1]),
+        StepwiseResistor("RS", 2, 1, 4, 10.0),
+    ]
+
+
+def test_components_are_slotted_records():
+    for component in mixed_components():
+        assert not hasattr(component, "__dict__")
+    with pytest.raises(AttributeError):
+        R("R1", 1, 2, 1.0).tolerance = 0.1
+
+
+def test_netlist_columns():
+    components = mixed_components()
+    netlist = Netlist(components, ref_node=1)
+    assert len(netlist) == netlist.num_edges == 7
+    assert netlist.num_nodes == 4
+    assert netlist.type_codes.tolist() == [1, 0, 3, 4, 2, 5, 6]
+    assert netlist.values.dtype == complex
+    assert np.isnan(netlist.values[5:]).all()
+    assert netlist.component_numbers.tolist() == [-1, -1, -1, -1, -1, 3, 4]
+    assert netlist.node1.tolist() == [0, 1, 2, 3, 0, 3, 1]
+    assert netlist.name_array(netlist.indices(V, I)) == ["V1", "I1"]
+
+
+def test_netlist_interns_names():
+    netlist = Netlist([R("R", 1, 2, 1.0), R("R", 2, 1, 1.0)])
+    assert netlist.names == ["R"]
+    assert netlist.name_ids.tolist() == [0, 0]
+
+
+def test_get_indices_from_netlist_matches_component_list():
+    components = mixed_components()
+    assert get_indices(Netlist(components)) == get_indices(components)
+
+
+def test_find_islands_splits_disjoint_subnetworks():
+    components = mixed_components() + [
+        V("V9", 10, 11, 1.0),
+        R("R9", 11, 12, 1.0),
+        R("R10", 12, 10, 1.0),
+        R("R11", "a", "b", 1.0),
+    ]
+    islands = find_islands(Netlist(components, ref_node=1))
+
+    assert len(islands) == 3
+    assert islands.ref_island == 0
+    assert islands.nodes(0) == [1, 2, 3, 4]
+    assert islands.nodes(1) == [10, 11, 12]
+    assert islands.nodes(2) == ["a", "b"]
+    assert islands.edges(1).tolist() == [7, 8, 9]
+    assert islands.floating == [1, 2]
+    assert "island 2 (FLOATING): 1 components" in islands.report()
+    assert len(find_islands(Netlist(mixed_components()))) == 1
@@ -0,0 +1,496 @@
+import numpy as np
+import pytest
+
+from elmer_circuitbuilder import R, V, I, L, C, Component, register_stamp
+from elmer_circuitbuilder.core import (
+    get_num_nodes,
+    get_indices,
+    get_incidence_matrix,
+    get_incidence_matrix_sparse,
+    get_incidence_triplets,
+    get_pin_arrays,
+    create_unknown_name,
+    NodeIndex,
+    get_resistance_matrix,
+    get_conductance_matrix,
+    get_inductance_matrix,
+    get_capacitance_matrix,
+    get_rhs,
+    get_tableau_matrix,
+    get_tableau_matrix_sparse,
+    solve_system,
+    Netlist,
+    assemble_tableau,
+    TABLEAU_STAMPS,
+    solve_frequency_sweep,
+    solve_transient,
+    Sine,
+    PWL,
+    assemble_mna,
+    solve_parameter_sweep,
+    tolerance_samples,
+    SPARSE_EDGE_THRESHOLD,
+)
+
+
+def rlc_components():
+    return [
+        V("V1", 1, 2, 10.0),
+        R("R1", 2, 3, 5.0),
+        L("L1", 3, 1, 1e-2),
+        C("C1", 2, 1, 1e-4),
+        I("I1", 3, 1, complex(0.5, 0.1)),
+    ]
+
+
+def dense_tableau(components, ref_node=1):
+    n, e = NodeIndex(components, ref_node).num_nodes, len(components)
+    indr, indv, indi, indInd, indcap, _ = get_indices(components)
+    return get_tableau_matrix(
+        get_incidence_matrix(components, n, e, ref_node),
+        get_resistance_matrix(components, e, indr, indi, indcap),
+        get_conductance_matrix(e, indr, indv, indInd),
+        get_inductance_matrix(components, e, indInd),
+        get_capacitance_matrix(components, e, indcap),
+        get_rhs(components, e, indi, indv),
+        n,
+        e,
+    )
+
+
+@pytest.mark.parametrize("ref_node", [1, 2])
+def test_sparse_tableau_matches_dense_tableau(ref_node):
+    pytest.importorskip("scipy")
+    components = rlc_components()
+    n, e = get_num_nodes(components), len(components)
+    M1, M2, b = dense_tableau(components, ref_node)
+    S1, S2, sb = get_tableau_matrix_sparse(components, n, e, ref_node)
+    assert np.array_equal(S1.toarray(), M1)
+    assert np.array_equal(S2.toarray(), M2)
+    assert np.array_equal(sb, b)
+
+
+@pytest.mark.parametrize("ref_node", [1, 2])
+def test_stamped_tableau_matches_dense_tableau(ref_node):
+    components = rlc_components()
+    M1, M2, b = dense_tableau(components, ref_node)
+    S1, S2, sb = assemble_tableau(Netlist(components, ref_node))
+    assert S1.dtype == M1.dtype and sb.dtype == b.dtype
+    assert np.array_equal(S1, M1)
+    assert np.array_equal(S2, M2)
+    assert np.array_equal(sb, b)
+
+
+def test_registered_stamp_plugs_into_assembler():
+    class Conductance(Component):
+        __slots__ = ()
+        type_code = 100
+
+    @register_stamp(Conductance)
+    def stamp_conductance(stamper, edges, netlist):
+        # branch equation i - G v = 0
+        rows = stamper.branch_rows(edges)
+        stamper.add_M1(rows, stamper.current_cols(edges), 1)
+        names = ["-" + name for name in netlist.name_array(edges)]
+        stamper.add_M1(rows, stamper.voltage_cols(edges), -netlist.values[edges], names)
+
+    try:
+        components = [V("V1", 2, 1, 10.0), Conductance("G1", 2, 1, 0.5)]
+        x = solve_system(*assemble_tableau(Netlist(components)))
+        # v_G1 = -10 (source sign convention of the tableau), i_G1 = 0.5 * v_G1
+        assert x[1, 0] == pytest.approx(-5.0)
+        M1, _, _ = assemble_tableau(Netlist(components), symbolic=True)
+        assert "-G1" in M1.data
+    finally:
+        del TABLEAU_STAMPS[Conductance]
+
+
+def test_sparse_lu_solution_matches_dense_solution():
+    pytest.importorskip("scipy")
+    components = rlc_components()
+    n, e = get_num_nodes(components), len(components)
+    x_dense = solve_system(*dense_tableau(components))
+    x_sparse = solve_system(*get_tableau_matrix_sparse(components, n, e, 1))
+    assert x_sparse.shape == x_dense.shape
+    np.testing.assert_allclose(x_sparse, x_dense)
+
+
+def test_sparse_solve_of_large_ladder():
+    pytest.importorskip("scipy")
+    # 10000 components: a dense tableau would need ~20k x 20k entries
+    nsections = 5000
+    components = [V("V1", 2, 1, 1.0)]
+    for k in range(2, nsections + 2):
+        components.append(R(f"R{k}", k, k + 1, 1.0))
+        components.append(R(f"Rg{k}", k + 1, 1, 1e6))
+    n, e = get_num_nodes(components), len(components)
+    M1, M2, b = get_tableau_matrix_sparse(components, n, e, 1)
+    assert M1.nnz < 10 * e
+    x = solve_system(M1, M2, b)
+    # source current flows out of the positive terminal into the ladder
+    assert abs(x[0, 0]) > 0
+
+
+@pytest.mark.parametrize("ref_index", [0, 1, 3])
+def test_incidence_triplets_drop_reference_row(ref_index):
+    node1 = np.array([0, 1, 2, 3])
+    node2 = np.array([1, 2, 3, 0])
+    rows, cols, signs = get_incidence_triplets(node1, node2, ref_index)
+    # every edge keeps the entries of its two terminals except the reference node
+    assert len(rows) == 2 * len(node1) - 2
+    assert rows.max() == 2
+    dense = np.zeros((3, 4))
+    np.add.at(dense, (rows, cols), signs)
+    full = np.zeros((4, 4))
+    full[node1, np.arange(4)] += 1
+    full[node2, np.arange(4)] -= 1
+    assert np.array_equal(dense, np.delete(full, ref_index, 0))
+
+
+def test_sparse_incidence_matches_dense_incidence():
+    pytest.importorskip("scipy")
+    components = rlc_components()
+    nodes = NodeIndex(components, ref_node=2)
+    A = get_incidence_matrix(components, nodes.num_nodes, len(components), 2)
+    A_sparse = get_incidence_matrix_sparse(
+        *get_pin_arrays(components, nodes), nodes.num_nodes, nodes.ref_index
+    )
+    assert np.array_equal(A_sparse.toarray(), A)
+
+
+def test_sparse_node_labels_are_relabelled_to_compact_indices():
+    plant = [
+        V("V1", 100, 1, 10.0),
+        R("R1", 100, 5000, 5.0),
+        R("R2", 5000, 1, 5.0),
+    ]
+    compact = [V("V1", 2, 1, 10.0), R("R1", 2, 3, 5.0), R("R2", 3, 1, 5.0)]
+    nodes = NodeIndex(plant, ref_node=1)
+    assert nodes.labels == [1, 100, 5000]
+    assert nodes.unknown_labels == [100, 5000]
+    assert np.array_equal(
+        get_incidence_matrix(plant, nodes.num_nodes, 3, 1, nodes),
+        get_incidence_matrix(compact, 3, 3, 1),
+    )
+    x_plant = solve_system(*dense_tableau(plant))
+    x_compact = solve_system(*dense_tableau(compact))
+    np.testing.assert_allclose(x_plant, x_compact)
+
+
+def test_string_node_labels_and_unknown_names():
+    components = [
+        V("V1", "phase_a", "gnd", 1.0),
+        R("R1", "phase_a", "star", 1.0),
+        R("R2", "star", "gnd", 1.0),
+    ]
+    nodes = NodeIndex(components, ref_node="gnd")
+    names, _ = create_unknown_name(components, "gnd", 1, nodes)
+    assert names[-2:] == ['"u_phase_a_circuit_1"', '"u_star_circuit_1"']
+    x = solve_system(*dense_tableau(components, ref_node="gnd"))
+    # repo convention: a source raises pin2 above pin1 by its value
+    np.testing.assert_allclose(x[-2:, 0], [-1.0, -0.5])
+
+
+def test_missing_reference_node_raises():
+    with pytest.raises(ValueError):
+        NodeIndex([R("R1", 2, 3, 1.0)], ref_node=1)
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_frequency_sweep_matches_single_frequency_solves(sparse):
+    if sparse:
+        pytest.importorskip("scipy")
+    components = rlc_components()
+    netlist = Netlist(components)
+    M1, M2, b = assemble_tableau(netlist, sparse=sparse)
+    names, _ = create_unknown_name(components, 1, 1)
+    freqs = np.linspace(1.0, 1e3, 7)
+    sweep = solve_frequency_sweep(M1, M2, b, freqs, names, batch_size=3)
+    assert sweep.x.shape == (7, len(names))
+    for k, f in enumerate(freqs):
+        np.testing.assert_allclose(sweep.x[k], solve_system(M1, M2, b, f).ravel())
+    np.testing.assert_allclose(sweep["i_R1"], sweep.x[:, names.index('"i_R1"')])
+    assert np.array_equal(sweep['"v_L1"'], sweep[names.index('"v_L1"')])
+
+
+def test_frequency_sweep_without_dynamic_elements():
+    components = [V("V1", 2, 1, 10.0), R("R1", 2, 1, 5.0)]
+    M1, M2, b = assemble_tableau(Netlist(components))
+    sweep = solve_frequency_sweep(M1, M2, b, [10.0, 20.0])
+    np.testing.assert_allclose(sweep.x, np.tile(solve_system(M1, M2, b).T, (2, 1)))
+
+
+def test_frequency_sweep_stacked_fallback_without_scipy(monkeypatch):
+    from elmer_circuitbuilder import core
+
+    M1, M2, b = assemble_tableau(Netlist(rlc_components()))
+    freqs = np.logspace(0, 4, 11)
+    expected = solve_frequency_sweep(M1, M2, b, freqs).x
+    monkeypatch.setattr(core, "sla", None)
+    stacked = solve_frequency_sweep(M1, M2, b, freqs, batch_size=4).x
+    np.testing.assert_allclose(stacked, expected)
+
+
+def test_frequency_sweep_uses_qz_only_for_many_frequencies(monkeypatch):
+    pytest.importorskip("scipy")
+    from elmer_circuitbuilder import core
+
+    M1, M2, b = assemble_tableau(Netlist(rlc_components()))
+    n = M1.shape[0]
+    many = np.logspace(0, 4, n)
+    expected = solve_frequency_sweep(M1, M2, b, many, method="solve").x
+    qz_sweep = solve_frequency_sweep(M1, M2, b, many, method="qz")
+    np.testing.assert_allclose(qz_sweep.x, expected)
+
+    calls = []
+    qz = core.sla.qz
+    monkeypatch.setattr(core.sla, "qz", lambda *a, **k: calls.append(1) or qz(*a, **k))
+    solve_frequency_sweep(M1, M2, b, many[:2])
+    assert not calls
+    np.testing.assert_allclose(solve_frequency_sweep(M1, M2, b, many).x, expected)
+    assert calls
+    with pytest.raises(ValueError):
+        solve_frequency_sweep(M1, M2, b, many, method="lu")
+
+
+@pytest.mark.parametrize("method, tol", [("trapezoidal", 1e-4), ("backward_euler", 1e-2)])
+def test_transient_rl_step_response(method, tol):
+    R_, L_ = 2.0, 1e-2
+    components = [V("V1", 1, 2, 10.0), R("R1", 2, 3, R_), L("L1", 3, 1, L_)]
+    sol = solve_transient(components, t_stop=0.05, dt=1e-5, method=method)
+    i_dc = solve_system(*assemble_tableau(Netlist(components)), freq=0)[2, 0].real
+    expected = i_dc * (1 - np.exp(-sol.t * R_ / L_))
+    assert sol.x.shape == (5001, 8)
+    np.testing.assert_allclose(sol["i_L1"], expected, atol=tol * abs(i_dc))
+
+
+def test_transient_sine_steady_state_matches_phasor():
+    components = [V("V1", 1, 2, 1.0), R("R1", 2, 3, 10.0), C("C1", 3, 1, 1e-4)]
+    freq = 50.0
+    sol = solve_transient(
+        components, t_stop=0.2, dt=2e-5, waveforms={"V1": Sine(1.0, freq)}
+    )
+    names, _ = create_unknown_name(components, 1, 1)
+    phasor = solve_system(*assemble_tableau(Netlist(components)), freq=freq)[:, 0]
+    late = sol.t > 0.15
+    expected = np.imag(np.outer(np.exp(2j * np.pi * freq * sol.t[late]), phasor))
+    np.testing.assert_allclose(sol.x[late], expected, atol=1e-4)
+    assert sol.unknown_names == names
+
+
+def test_transient_pwl_current_source_and_factorization_reuse(monkeypatch):
+    from elmer_circuitbuilder import core
+
+    factorizations = []
+    factorize = core._factorize
+    monkeypatch.setattr(
+        core, "_factorize", lambda lhs: factorizations.append(1) or factorize(lhs)
+    )
+    components = [I("I1", 2, 1, None), R("R1", 2, 1, 4.0)]
+    ramp = PWL([0.0, 1e-3], [0.0, 2.0])
+    sol = solve_transient(components, 2e-3, 1e-4, waveforms={"I1": ramp})
+    assert len(factorizations) == 2
+    np.testing.assert_allclose(sol["i_I1"], ramp(sol.t))
+    np.testing.assert_allclose(np.abs(sol["v_R1"]), 4.0 * ramp(sol.t))
+
+
+def test_transient_sparse_path_matches_dense_path():
+    pytest.importorskip("scipy")
+    components = rlc_components()[:4]
+    dense = solve_transient(components, 5e-3, 1e-5, sparse=False)
+    sparse = solve_transient(components, 5e-3, 1e-5, sparse=True)
+    np.testing.assert_allclose(sparse.x, dense.x, atol=1e-9)
+
+
+def test_transient_rejects_undefined_sources():
+    with pytest.raises(ValueError):
+        solve_transient([I("I1", 2, 1, None), R("R1", 2, 1, 4.0)], 1e-3, 1e-4)
+    with pytest.raises(ValueError):
+        solve_transient([R("R1", 2, 1, 4.0)], 1e-3, 1e-4, waveforms={"R1": Sine(1, 50)})
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+@pytest.mark.parametrize("sparse", [False, True])
+def test_parameter_sweep_matches_individual_solves(formulation, sparse):
+    if sparse:
+        pytest.importorskip("scipy")
+    components = rlc_components()
+    values = {"R1": np.linspace(1.0, 10.0, 5), "C1": 2e-4, "V1": [1, 2, 3, 4, 5]}
+    sweep = solve_parameter_sweep(
+        components, values, freq=60, formulation=formulation, sparse=sparse, batch_size=2
+    )
+    assert sweep.x.shape[0] == 5
+    for k in range(5):
+        sample = [
+            V("V1", 1, 2, float(values["V1"][k])),
+            R("R1", 2, 3, values["R1"][k]),
+            L("L1", 3, 1, 1e-2),
+            C("C1", 2, 1, 2e-4),
+            I("I1", 3, 1, complex(0.5, 0.1)),
+        ]
+        netlist = Netlist(sample)
+        assemble = assemble_mna if formulation == "mna" else assemble_tableau
+        expected = solve_system(*assemble(netlist), freq=60)[:, 0]
+        np.testing.assert_allclose(sweep.x[k], expected)
+    np.testing.assert_allclose(sweep["u_2_circuit_1"], sweep.x[:, -2])
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+def test_sparse_parameter_sweep_of_large_ladder_matches_dense_sweep(formulation):
+    pytest.importorskip("scipy")
+    nsections = SPARSE_EDGE_THRESHOLD // 3 + 1
+    components = [V("V1", 2, 1, 1.0)]
+    for k in range(2, nsections + 2):
+        components.append(R(f"R{k}", k, k + 1, 1.0))
+        components.append(C(f"C{k}", k + 1, 1, 1e-4))
+        components.append(L(f"L{k}", k + 1, 1, 1e-1))
+    assert len(components) > SPARSE_EDGE_THRESHOLD
+    values = {"R2": np.linspace(1.0, 3.0, 4), "C5": [1e-4, 2e-4, 3e-4, 4e-4]}
+    sweeps = [
+        solve_parameter_sweep(components, values, formulation=formulation, sparse=sparse)
+        for sparse in (None, False)
+    ]
+    np.testing.assert_allclose(sweeps[0].x, sweeps[1].x, rtol=1e-9, atol=1e-12)
+
+
+def test_monte_carlo_tolerance_samples():
+    components = rlc_components()
+    samples = tolerance_samples(components, {"R1": 0.05, "L1": 0.1}, 2000, seed=1)
+    assert samples["R1"].shape == (2000,)
+    assert np.all(np.abs(samples["R1"] / 5.0 - 1) <= 0.05)
+    sweep = solve_parameter_sweep(components, samples)
+    assert sweep.x.shape == (2000, 12)
+    assert np.isfinite(sweep.x).all()
+    with pytest.raises(KeyError):
+        solve_parameter_sweep(components, {"R9": [1.0]})
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+def test_solve_circuit_returns_structured_solution(formulation, capsys):
+    from elmer_circuitbuilder import number_of_circuits, solve_circuit
+
+    circuits = number_of_circuits(2)
+    circuits[1].components.append(rlc_components())
+    circuits[2].components.append([V("V2", 1, 2, 2.0), R("R2", 2, 1, 4.0)])
+    solutions = solve_circuit(circuits, formulation=formulation)
+    assert capsys.readouterr().out == ""
+    assert sorted(solutions) == [1, 2]
+
+    names = [c.name for c in rlc_components()]
+    tableau = solve_system(*assemble_tableau(Netlist(rlc_components())))[:, 0]
+    e = len(names)
+    solution = solutions[1]
+    np.testing.assert_allclose(solution.branch_currents(), tableau[:e])
+    np.testing.assert_allclose(solution.branch_voltages(), tableau[e : 2 * e])
+    np.testing.assert_allclose(solution.node_potentials([2, 3]), tableau[2 * e :])
+    assert solution.node_potentials([1])[0] == 0
+    assert solution.branch_currents(["R1"])[0] == pytest.approx(tableau[1])
+    assert solution["u_2_circuit_1"] == pytest.approx(tableau[2 * e])
+    assert solutions[2].branch_currents("R2")[0] == pytest.approx(0.5)
+
+    solve_circuit(circuits, formulation=formulation, verbose=True)
+    assert capsys.readouterr().out.count("Solution:") == 2
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_adjoint_sensitivities_match_finite_differences(sparse):
+    from elmer_circuitbuilder import solve_sensitivities
+
+    if sparse:
+        pytest.importorskip("scipy")
+    components = rlc_components()
+    outputs = ["i_R1", '"u_3_circuit_1"', "v_C1"]
+    sens = solve_sensitivities(components, outputs, freq=60, sparse=sparse)
+
+    assert sens.parameters == [c.name for c in components]
+    assert sens.x.shape == (len(components), len(outputs))
+    names, _ = create_unknown_name(components, 1, 1)
+    base = solve_system(*assemble_tableau(Netlist(components)), freq=60)[:, 0]
+    np.testing.assert_allclose(sens.solution.x, base)
+
+    for edge, component in enumerate(components):
+        h = 1e-6 * abs(component.value)
+        x = []
+        for step in (h, -h):
+            perturbed = list(components)
+            perturbed[edge] = type(component)(
+                component.name, component.pin1, component.pin2, component.value + step
+            )
+            x.append(solve_system(*assemble_tableau(Netlist(perturbed)), freq=60)[:, 0])
+        fd = (x[0] - x[1]) / (2 * h)
+        for output in outputs:
+            expected = fd[names.index('"' + output.strip('"') + '"')]
+            assert sens.derivative(output, component.name) == pytest.approx(
+                expected, rel=1e-5, abs=1e-9
+            )
+
+    with pytest.raises(KeyError):
+        solve_sensitivities(components, ["i_X"])
+
+
+def test_sensitivities_of_a_registered_stamp_writing_kcl_rows():
+    from elmer_circuitbuilder import solve_sensitivities
+
+    class Injector(Component):
+        __slots__ = ()
+        type_code = 101
+
+    @register_stamp(Injector)
+    def stamp_injector(stamper, edges, netlist):
+        # current injected straight into the KCL rows, the branch current is zero
+        rows, cols, signs = get_incidence_triplets(
+            netlist.node1[edges], netlist.node2[edges], netlist.nodes.ref_index
+        )
+        values = netlist.values[edges[cols]]
+        stamper.add_b(stamper.kcl_rows(rows), (-signs * values.T).T)
+        stamper.add_M1(stamper.branch_rows(edges), stamper.current_cols(edges), 1)
+
+    try:
+        components = [
+            V("V1", 2, 1, 1.0),
+            R("R1", 2, 3, 2.0),
+            R("R2", 3, 1, 4.0),
+            Injector("J1", 3, 1, 0.5),
+        ]
+        sens = solve_sensitivities(components, ['"u_3_circuit_1"'])
+        # u3 = (V1 / R1 - J1) * R1 R2 / (R1 + R2), up to the tableau source sign
+        assert abs(sens.derivative('"u_3_circuit_1"', "J1")) == pytest.approx(4 / 3)
+        assert sens.derivative('"u_3_circuit_1"', "R1") != 0
+
+        @register_stamp(Injector)
+        def stamp_squared(stamper, edges, netlist):
+            stamper.add_M1(
+                stamper.branch_rows(edges),
+                stamper.current_cols(edges),
+                netlist.values[edges] ** 2,
+            )
+
+        with pytest.raises(ValueError):
+            solve_sensitivities(components, ['"u_3_circuit_1"'])
+    finally:
+        del TABLEAU_STAMPS[Injector]
+
+
+@pytest.mark.parametrize("formulation", ["tableau", "mna"])
+def test_disjoint_islands_are_solved_block_by_block(formulation, capsys):
+    from elmer_circuitbuilder import number_of_circuits, solve_circuit
+
+    floating = [V("V9", 10, 11, 2.0), R("R9", 11, 10, 4.0), C("C9", 11, 12, 1e-4)]
+    circuits = number_of_circuits(1)
+    circuits[1].components.append(rlc_components() + floating)
+    solution = solve_circuit(circuits, formulation=formulation, verbose=True)[1]
+    assert "splits into 2 islands" in capsys.readouterr().out
+
+    circuits = number_of_circuits(1)
+    circuits[1].components.append(rlc_components())
+    reference = solve_circuit(circuits, formulation=formulation)[1]
+    e = len(rlc_components())
+    np.testing.assert_allclose(
+        solution.branch_currents()[:e], reference.branch_currents()
+    )
+    np.testing.assert_allclose(
+        solution.node_potentials([2, 3]), reference.node_potentials([2, 3])
+    )
+    # the floating island is referenced to its first node
+    assert solution.node_potentials([10, 11]) == pytest.approx([0, 2.0])
+    assert solution.branch_currents(["R9", "C9"]) == pytest.approx([0.5, 0])
@@ -2,11 +2,29 @@ import pytest
 import numpy as np
 from types import SimpleNamespace
 
+from elmer_circuitbuilder import R, V, I, L, C, ElmerComponent
 from elmer_circuitbuilder.core import (
     get_incidence_matrix_str,
     get_resistance_matrix_str,
     get_inductance_matrix_str,
     get_capacitance_matrix_str,
+    SparseSymbolicMatrix,
+    PermutedRows,
+    get_num_nodes,
+    get_indices,
+    get_conductance_matrix_str,
+    get_rhs_str,
+    get_tableau_matrix_str,
+    get_zero_rows_str,
+    get_zero_rows_sparse_str,
+    get_zero_rows,
+    get_elmer_row_order,
+    elmer_format_matrix,
+    elmer_format_matrix_sparse_str,
+    canonicalize_coefficients,
+    ZERO_COEFFICIENTS,
+    Netlist,
+    assemble_tableau,
 )
 
 
@@ -27,3 +45,229 @@ def _indices_for_types(components):
     indi = [i for i, c in enumerate(components) if c.component_type == "inductor"]
     indcap = [i for i, c in enumerate(components) if c.component_type == "capacitor"]
     return indr, indi, indcap
+
+
+def _mixed_components():
+    coil = ElmerComponent("Coil", 4, 1, 1, [1])
+    return [
+        V("V1", 1, 2, 1.0),
+        R("R1", 2, 3, 2.0),
+        L("L1", 3, 4, 1e-3),
+        C("C1", 4, 1, 1e-6),
+        I("I1", 1, 3, 0.5),
+        coil,
+    ]
+
+
+def _dense_tableau(components, ref_node=1):
+    n, e = get_num_nodes(components), len(components)
+    indr, indv, indi, indInd, indcap, _ = get_indices(components)
+    return get_tableau_matrix_str(
+        get_incidence_matrix_str(components, n, e, ref_node),
+        get_resistance_matrix_str(components, e, indr, indi, indcap),
+        get_conductance_matrix_str(e, indr, indv, indInd),
+        get_inductance_matrix_str(components, e, indInd),
+        get_capacitance_matrix_str(components, e, indcap),
+        get_rhs_str(components, e, indi, indv),
+        n,
+        e,
+    )
+
+
+def _sparse_tableau(components, ref_node=1):
+    return assemble_tableau(Netlist(components, ref_node), symbolic=True)
+
+
+@pytest.mark.parametrize("ref_node", [1, 3])
+def test_sparse_tableau_matches_dense_tableau(ref_node):
+    components = _mixed_components()
+    dense = _dense_tableau(components, ref_node)
+    sparse = _sparse_tableau(components, ref_node)
+    for d, s in zip(dense, sparse):
+        assert isinstance(s, SparseSymbolicMatrix)
+        assert np.array_equal(s.to_dense(), d)
+    assert get_zero_rows_sparse_str(*sparse) == get_zero_rows_str(*dense)
+
+
+@pytest.mark.parametrize("ref_node", [1, 3])
+def test_stamped_symbolic_tableau_keeps_self_loop_entries(ref_node):
+    # the incidence entries of a self-loop are concatenated to "1-1"
+    components = _mixed_components() + [R("Rloop", 2, 2, 1.0)]
+    netlist = Netlist(components, ref_node)
+    M1, _, _ = _sparse_tableau(components, ref_node)
+    node = netlist.nodes.unknown_labels.index(2)
+    edge = len(components) - 1
+    assert M1.to_dense()[node, edge] == b"1-1"
+    assert M1.items() == sorted(M1.items(), key=lambda t: (t[0], t[1]))
+
+
+def test_canonicalize_coefficients():
+    M = np.array([[b"", b"-0.0", b"1.0"], [b"-1.0", b"R1", b"-1.0-1.0"]], dtype="|S500")
+    assert canonicalize_coefficients(M.copy()).tolist() == [
+        [b"0", b"0", b"1"],
+        [b"-1", b"R1", b"-1.0-1.0"],
+    ]
+    assert canonicalize_coefficients(M, ZERO_COEFFICIENTS).tolist() == [
+        [b"0", b"0", b"1.0"],
+        [b"-1.0", b"R1", b"-1.0-1.0"],
+    ]
+
+
+def test_dense_tableau_has_canonical_coefficients():
+    M1, M2, b = _dense_tableau(_mixed_components())
+    for matrix in (M1, M2, b):
+        assert not np.isin(matrix, [b"", b"0.0", b"-0.0", b"1.0", b"-1.0"]).any()
+
+
+def test_zero_rows_agree_for_numeric_string_and_sparse_matrices():
+    components = _mixed_components()
+    netlist = Netlist(components)
+    expected = get_zero_rows_str(*_dense_tableau(components))
+    # the Elmer component equation is the only empty row
+    assert expected == [netlist.num_nodes - 1 + 2 * netlist.num_edges - 1]
+    assert get_zero_rows_sparse_str(*assemble_tableau(netlist, symbolic=True)) == expected
+    assert get_zero_rows(*assemble_tableau(netlist)) == expected
+    pytest.importorskip("scipy")
+    assert get_zero_rows(*assemble_tableau(netlist, sparse=True)) == expected
+
+
+def test_zero_rows_do_not_cancel_opposite_entries():
+    M1 = np.array([[1.0, 0.0], [0.0, 0.0]])
+    M2 = np.array([[-1.0, 0.0], [0.0, 0.0]])
+    b = np.zeros((2, 1))
+    assert get_zero_rows(M1, M2, b) == [1]
+    M1_str = np.array([[b"1", b"-0.0"], [b"0", b"-0"]], dtype="|S500")
+    M2_str = np.array([[b"0", b"0"], [b"0.0", b"0"]], dtype="|S500")
+    b_str = np.array([[b"0"], [b"0"]], dtype="|S500")
+    assert get_zero_rows_str(M1_str, M2_str, b_str) == [1]
+
+
+def test_zero_rows_ignore_explicit_zero_strings_of_sparse_matrices():
+    components = _mixed_components()
+    netlist = Netlist(components)
+    M1, M2, b = assemble_tableau(netlist, symbolic=True)
+    expected = get_zero_rows_sparse_str(M1, M2, b)
+    row = expected[0]
+    M1.add(row, 0, "0")
+    M2.extend([row, row], [1, 2], ["-0", "0.0"])
+    b.add(row, 0, "-0.0")
+    assert get_zero_rows_sparse_str(M1, M2, b) == expected
+    M2.add(row, 3, "L1")
+    assert get_zero_rows_sparse_str(M1, M2, b) == expected[1:]
+
+
+def test_elmer_row_order_applies_swaps_in_sequence():
+    # chained swaps: (0, 2) then (2, 4)
+    M = np.arange(5)
+    for z, v in zip([0, 2], [2, 4]):
+        M[[z, v]] = M[[v, z]]
+    assert get_elmer_row_order(5, [2, 4], [0, 2]).tolist() == M.tolist()
+
+
+def test_elmer_format_sparse_view_matches_dense_format():
+    components = _mixed_components()
+    netlist = Netlist(components)
+    dense = _dense_tableau(components)
+    sparse = assemble_tableau(netlist, symbolic=True)
+    zero_rows = get_zero_rows_str(*dense)
+    vcomp_rows = [netlist.num_edges + 5]
+    snapshot = [list(zip(m.rows, m.cols, m.data)) for m in sparse]
+
+    elmer_dense = elmer_format_matrix(*dense, vcomp_rows, zero_rows)
+    elmer_sparse = elmer_format_matrix_sparse_str(*sparse, vcomp_rows, zero_rows)
+    for d, s in zip(elmer_dense, elmer_sparse):
+        assert np.array_equal(s.to_dense(), d)
+        items = s.items()
+        assert items == sorted(items, key=lambda t: (t[0], t[1]))
+    # the view is lazy: the assembled matrices are left untouched
+    assert [list(zip(m.rows, m.cols, m.data)) for m in sparse] == snapshot
+    assert vcomp_rows[0] not in elmer_sparse[1].nonzero_rows()
+
+
+def test_sparse_tableau_stores_only_non_zeros():
+    # ladder network: memory must grow with the edges, not with (2*edges + nodes)^2
+    components = [V("V1", 2, 1, 1.0)]
+    for k in range(2, 1002):
+        components.append(R(f"R{k}", k, k + 1, 1.0))
+        components.append(C(f"C{k}", k + 1, 1, 1e-6))
+    M1, M2, b = _sparse_tableau(components)
+    nedges = len(components)
+    assert M1.shape[0] > 4000
+    assert M1.nnz <= 6 * nedges
+    assert M2.nnz == 1000
+    assert b.nnz == 1
+
+
+def test_sparse_symbolic_matrix_concatenates_duplicates_and_round_trips():
+    m = SparseSymbolicMatrix((2, 2))
+    m.add(1, 0, "1")
+    m.add(1, 0, "-1")
+    m.add(0, 1, "R1")
+    m.add(0, 0, "")
+    assert m.items() == [(0, 1, "R1"), (1, 0, "1-1")]
+    round_trip = SparseSymbolicMatrix.from_dense(m.to_dense())
+    assert round_trip.items() == m.items()
+
+
+def test_row_range_items_follow_csr_row_pointers():
+    components = _mixed_components()
+    netlist = Netlist(components)
+    M1, M2, b = assemble_tableau(netlist, symbolic=True)
+    dense = M1.to_dense()
+    n = M1.shape[0]
+    assert M1.indptr()[-1] == M1.nnz and len(M1.indptr()) == n + 1
+
+    view = PermutedRows(M1, np.arange(n)[::-1])
+    view_items = view.items()
+    for start, stop in [(0, n), (2, 7), (5, 5), (n - 3, n + 10), (-4, 3)]:
+        expected = [
+            (i, j, v)
+            for i, j, v in zip(M1.rows, M1.cols, M1.data)
+            if max(start, 0) <= i < stop
+        ]
+        assert M1.items(start, stop) == expected
+        assert view.items(start, stop) == [t for t in view_items if start <= t[0] < stop]
+    # vectorized dense conversion keeps the same entries
+    assert SparseSymbolicMatrix.from_dense(dense).items() == M1.items()
+    unicode = np.array([["0", "-L1"], ["-0.0", ""]])
+    assert SparseSymbolicMatrix.from_dense(unicode).items() == [(0, 1, "-L1")]
+
+
+def test_matrix_entry_lines_are_formatted_in_one_batch():
+    import io
+
+    from elmer_circuitbuilder.core import write_kcl_equations
+
+    m = SparseSymbolicMatrix((3, 3))
+    m.add(0, 2, "-R1")
+    m.add(1, 0, "1")
+    m.add(2, 1, "L1")
+    stream = io.StringIO()
+    write_kcl_equations(SimpleNamespace(index=7), 3, 3, m, m, stream)
+    lines = stream.getvalue().splitlines()
+    assert lines[3:] == [
+        "$ C.7.B(0,2) = -R1",
+        "$ C.7.B(1,0) = 1",
+        "$ C.7.A(0,2) = -R1",
+        "$ C.7.A(1,0) = 1",
+        "",
+    ]
+
+
+def test_compact_entries_are_written_in_row_slices():
+    import io
+
+    from elmer_circuitbuilder.core import write_kcl_equations
+
+    m = SparseSymbolicMatrix((3, 12))
+    for j, value in [(0, "1"), (1, "-R1"), (4, "1/R1+1/R2"), (11, "L1")]:
+        m.add(0, j, value)
+    m.add(2, 3, "-1")
+    stream = io.StringIO()
+    empty = SparseSymbolicMatrix((3, 12))
+    write_kcl_equations(SimpleNamespace(index=7), 4, 12, empty, m, stream, compact=True)
+    assert stream.getvalue().splitlines()[3:6] == [
+        "$ C.7.B(0,0:4) = [(1) (-R1) (0) (0) (1/R1+1/R2)]",
+        "$ C.7.B(0,11) = L1",
+        "$ C.7.B(2,3) = -1",
+    ]